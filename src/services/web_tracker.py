@@ -3,15 +3,60 @@ Real-time Web-Based Vessel Tracker with Map Visualization
 Displays tracked vessels on an interactive map with live updates.
 """
 
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, jsonify, request
 from flask_socketio import SocketIO, emit
-import websocket
+import asyncio
+import atexit
 import json
+import logging
+import logging.handlers
+import queue
 import sqlite3
 import threading
 import time
 from pathlib import Path
 from datetime import datetime
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+
+# orjson parses/encodes in C and is considerably faster than the stdlib on the
+# per-message WebSocket path; fall back to json when it isn't installed.
+try:
+    import orjson
+
+    json_loads = orjson.loads  # Accepts both str and bytes frames
+
+    def json_dumps(obj):
+        """Encode obj to a JSON str (sent as a WebSocket text frame)."""
+        # OPT_NON_STR_KEYS matches json.dumps for dicts keyed by MMSI
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    class OrjsonSerializer:
+        """orjson-backed dumps/loads used by Socket.IO to encode packets."""
+
+        @staticmethod
+        def dumps(obj, **kwargs):
+            # Socket.IO passes json.dumps options (separators); orjson is compact already
+            return json_dumps(obj)
+
+        @staticmethod
+        def loads(data, **kwargs):
+            return json_loads(data)
+
+    socketio_json = OrjsonSerializer
+
+    def json_fragment(obj):
+        """Pre-encode obj; orjson embeds the Fragment verbatim in Socket.IO packets."""
+        return orjson.Fragment(orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+    json_dumps = json.dumps
+    socketio_json = json
+
+    def json_fragment(obj):
+        """stdlib json has no pre-encoded values; obj is encoded on each emit."""
+        return obj
 
 # Configuration
 DB_NAME = "vessel_static_data.db"
@@ -33,9 +78,35 @@ def ensure_econowind_column(conn):
         pass
 
 
+def ensure_last_updated_index(conn, schema='main'):
+    """Ensure vessels_static has the index used by the tracked vessel query."""
+    try:
+        # Turns the last_updated filter + ORDER BY ... LIMIT into an ordered index walk
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS {schema}.idx_vessels_static_last_updated "
+            "ON vessels_static(last_updated DESC)"
+        )
+        conn.commit()
+    except sqlite3.OperationalError:
+        # Table may not exist yet or the database is busy; the query works without it.
+        pass
+
+
 API_KEY_FILE = "api.txt"
 WEBSOCKET_URL = "wss://stream.aisstream.io/v0/stream"
-MAX_MMSI_PER_CONNECTION = 50
+MAX_MMSI_PER_CONNECTION = 50  # aisstream.io accepts at most 50 MMSIs per subscription
+BROADCAST_INTERVAL = 0.25  # Seconds between coalesced vessel_batch emits
+POSITION_LOG_INTERVAL = 1000  # Log a summary every N position reports per batch
+VESSELS_CACHE_TTL = 1.0  # Seconds a cached /api/vessels response may be reused
+MAX_UPDATES_PER_WRITE = 500  # Position reports applied per history transaction
+
+# Substring probes used to skip parsing frames that are neither position
+# reports nor errors (frames are received as raw bytes)
+POSITION_MARKER = b'"PositionReport"'
+ERROR_MARKERS = (b'"error"', b'"Error"')
+
+# Static defaults for position reports from vessels not loaded at startup
+EMPTY_STATIC = {'name': 'Unknown', 'length': None, 'flag_state': 'Unknown'}
 
 # Flask app
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -52,13 +123,25 @@ app = Flask(__name__,
             static_folder=str(static_dir))
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 app.config['SECRET_KEY'] = 'ais-tracker-secret'
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Threading mode: the routes and position writer make blocking sqlite3 calls,
+# which would stall every client under a greenlet-based async mode
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading', json=socketio_json)
+
+logger = logging.getLogger(__name__)
 
 # Global state
 API_KEY = None
-vessel_positions = {}  # {mmsi: {lat, lon, sog, cog, timestamp, name, ...}}
+vessel_positions = {}  # {mmsi: VesselPosition}
 vessel_static_data = {}  # {mmsi: {name, length, type, flag, ...}}
 tracking_active = False
+pending_updates = {}  # {mmsi: position} waiting for the next broadcast tick
+positions_lock = threading.Lock()  # Guards pending_updates and VesselPosition fields
+position_updates = queue.SimpleQueue()  # Reports from trackers for apply_position_updates
+vessels_cache = None  # Encoded /api/vessels response body
+vessels_cache_time = 0.0
+vessels_cache_dirty = True  # Set whenever positions or static data change
+initial_snapshot = None  # Pre-encoded initial_data payload, rebuilt on connect when dirty
+initial_snapshot_dirty = True  # Set whenever positions or static data change
 
 
 # Ship type mapping
@@ -147,60 +230,82 @@ def load_api_keys():
         raise Exception(f"Error loading API keys: {e}")
 
 
-def get_filtered_vessels():
-    """Get vessels from database matching filter criteria."""
+def load_static_mirror(mem):
+    """Copy the tracked vessel rows into the in-memory SQLite database mem.
+    
+    Only the filtered rows are materialized (not the whole file, whose
+    position history grows without bound).
+    """
     project_root = Path(__file__).parent.parent.parent
     db_path = project_root / DB_NAME
     
-    conn = None
+    mem.execute('PRAGMA journal_mode=OFF')
+    mem.execute('PRAGMA synchronous=OFF')
+    mem.execute('PRAGMA temp_store=MEMORY')
+    
+    mem.execute('ATTACH DATABASE ? AS disk', (str(db_path),))
     try:
-        conn = sqlite3.connect(db_path, timeout=30)
-        conn.execute('PRAGMA journal_mode=WAL')
-        cursor = conn.cursor()
+        mem.execute('PRAGMA disk.journal_mode=WAL')
+        mem.execute('PRAGMA disk.mmap_size=268435456')  # Read pages via mmap (256 MB)
+        ensure_last_updated_index(mem, 'disk')
         
         # Try query with gross_tonnage first
         try:
-            query = '''
+            mem.execute('''
+                CREATE TABLE tracked_vessels AS
                 SELECT v.mmsi, v.name, v.ship_type, v.detailed_ship_type, v.length, v.beam, v.imo, 
                        v.call_sign, v.flag_state, v.signatory_company, v.wind_assisted, e.gross_tonnage
-                FROM vessels_static v
-                LEFT JOIN eu_mrv_emissions e ON v.imo = e.imo
+                FROM disk.vessels_static v
+                LEFT JOIN disk.eu_mrv_emissions e ON v.imo = e.imo
                 WHERE v.mmsi IS NOT NULL
                   AND v.last_updated >= datetime('now', '-30 days')
                 ORDER BY v.last_updated DESC
                 LIMIT 2000
-            '''
-            cursor.execute(query)
-            vessels = cursor.fetchall()
-            has_gross_tonnage = True
+            ''')
         except sqlite3.OperationalError:
             # Fallback query without gross_tonnage if column doesn't exist
             print("Warning: gross_tonnage column not found, using fallback query")
-            query = '''
+            mem.execute('''
+                CREATE TABLE tracked_vessels AS
                 SELECT v.mmsi, v.name, v.ship_type, v.detailed_ship_type, v.length, v.beam, v.imo, 
-                       v.call_sign, v.flag_state, v.signatory_company, v.wind_assisted
-                FROM vessels_static v
+                       v.call_sign, v.flag_state, v.signatory_company, v.wind_assisted,
+                       NULL AS gross_tonnage
+                FROM disk.vessels_static v
                 WHERE v.mmsi IS NOT NULL
                   AND v.last_updated >= datetime('now', '-30 days')
                 ORDER BY v.last_updated DESC
                 LIMIT 2000
-            '''
-            cursor.execute(query)
-            vessels = cursor.fetchall()
-            has_gross_tonnage = False
+            ''')
+        mem.commit()
     finally:
-        if conn:
-            conn.close()
+        mem.execute('DETACH DATABASE disk')
+
+
+def get_filtered_vessels():
+    """Get vessels from database matching filter criteria."""
+    global vessels_cache_dirty, initial_snapshot_dirty
     
-    # Store static data
-    for vessel in vessels:
-        if has_gross_tonnage:
-            mmsi, name, ship_type, detailed_ship_type, length, beam, imo, call_sign, flag_state, signatory_company, wind_assisted, gross_tonnage = vessel
-        else:
-            mmsi, name, ship_type, detailed_ship_type, length, beam, imo, call_sign, flag_state, signatory_company, wind_assisted = vessel
-            gross_tonnage = None
-            
-        vessel_static_data[mmsi] = {
+    # timeout applies to the attached file, which collectors write concurrently
+    mem = sqlite3.connect(':memory:', timeout=30)
+    try:
+        load_static_mirror(mem)
+        
+        # Rows were inserted newest first, so rowid order keeps last_updated DESC
+        cursor = mem.cursor()
+        cursor.arraysize = 1000
+        cursor.execute('''
+            SELECT mmsi, name, ship_type, detailed_ship_type, length, beam, imo,
+                   call_sign, flag_state, signatory_company, wind_assisted, gross_tonnage
+            FROM tracked_vessels
+            ORDER BY rowid
+        ''')
+        vessels = cursor.fetchall()
+    finally:
+        mem.close()
+    
+    # Store static data (both queries return the same columns)
+    vessel_static_data.update({
+        mmsi: {
             'name': name or 'Unknown',
             'ship_type': ship_type,
             'detailed_ship_type': detailed_ship_type,  # From CO2 emissions dataset
@@ -213,25 +318,166 @@ def get_filtered_vessels():
             'wind_assisted': wind_assisted or 0,  # Wind propulsion flag
             'gross_tonnage': gross_tonnage  # From EU MRV emissions
         }
+        for (mmsi, name, ship_type, detailed_ship_type, length, beam, imo,
+             call_sign, flag_state, signatory_company, wind_assisted, gross_tonnage) in vessels
+    })
+    vessels_cache_dirty = True
+    initial_snapshot_dirty = True
     
     return [vessel[0] for vessel in vessels]
 
 
+class VesselPosition:
+    """Latest known position of a tracked vessel.
+    
+    Uses __slots__ so each tracked vessel costs a compact fixed-layout
+    object instead of a per-update dict of eight keys.
+    """
+    
+    __slots__ = ('lat', 'lon', 'sog', 'cog', 'timestamp', 'name', 'length', 'flag_state')
+    
+    def __init__(self, lat, lon, sog, cog, timestamp, name, length, flag_state):
+        self.lat = lat
+        self.lon = lon
+        self.sog = sog
+        self.cog = cog
+        self.timestamp = timestamp
+        self.name = name
+        self.length = length
+        self.flag_state = flag_state
+    
+    def update(self, lat, lon, sog, cog, timestamp):
+        """Record a new position report in place."""
+        self.lat = lat
+        self.lon = lon
+        self.sog = sog
+        self.cog = cog
+        self.timestamp = timestamp
+    
+    def to_dict(self):
+        """Return the position as a JSON-serializable dict."""
+        return {
+            'lat': self.lat,
+            'lon': self.lon,
+            'sog': self.sog,
+            'cog': self.cog,
+            'timestamp': self.timestamp,
+            'name': self.name,
+            'length': self.length,
+            'flag_state': self.flag_state
+        }
+
+
+def snapshot_positions():
+    """Copy every current position to a plain dict, consistent with the writer."""
+    with positions_lock:
+        return {mmsi: position.to_dict() for mmsi, position in vessel_positions.items()}
+
+
+def apply_position_updates():
+    """Apply queued position reports to shared state and the history database.
+    
+    This thread is the only writer of vessel_positions; trackers just
+    enqueue (mmsi, lat, lon, sog, cog, timestamp) tuples. Errors are logged
+    and never end the thread, otherwise the queue would grow unbounded.
+    """
+    global vessels_cache_dirty, initial_snapshot_dirty
+    
+    project_root = Path(__file__).parent.parent.parent
+    db_path = project_root / DB_NAME
+    conn = None
+    
+    while True:
+        # Block for one report, then drain whatever else has queued up
+        updates = [position_updates.get()]
+        try:
+            while len(updates) < MAX_UPDATES_PER_WRITE:
+                updates.append(position_updates.get_nowait())
+        except queue.Empty:
+            pass
+        
+        try:
+            with positions_lock:
+                for mmsi, lat, lon, sog, cog, timestamp in updates:
+                    # Reuse the vessel's existing object; only new vessels allocate
+                    position = vessel_positions.get(mmsi)
+                    if position is None:
+                        static = vessel_static_data.get(mmsi, EMPTY_STATIC)
+                        position = VesselPosition(
+                            lat, lon, sog, cog, timestamp,
+                            static['name'], static['length'], static['flag_state']
+                        )
+                        vessel_positions[mmsi] = position
+                    elif (position.lat == lat and position.lon == lon
+                            and position.sog == sog and position.cog == cog):
+                        # Repeated report (e.g. moored vessel): not broadcast. The
+                        # fresh timestamp reaches open maps via their 15 s
+                        # /api/vessels poll and new clients via initial_data.
+                        position.timestamp = timestamp
+                        continue
+                    else:
+                        position.update(lat, lon, sog, cog, timestamp)
+                    
+                    # Queue for the next broadcast tick (latest position wins)
+                    pending_updates[mmsi] = position
+                    
+                    logger.debug("[Position] %s - %s: %.4f, %.4f", mmsi, position.name, lat, lon)
+            vessels_cache_dirty = True
+            initial_snapshot_dirty = True
+        except Exception:
+            logger.exception("[Position] Error applying position updates")
+        
+        # Save positions to history database in one transaction
+        try:
+            if conn is None:
+                conn = sqlite3.connect(db_path, timeout=5)
+                conn.execute('PRAGMA journal_mode=WAL')
+            conn.executemany('''
+                INSERT INTO vessel_positions (mmsi, latitude, longitude, sog, cog, timestamp)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', updates)
+            conn.commit()
+        except Exception:
+            logger.exception("[Position DB] Error saving %d positions", len(updates))
+            # Drop the connection (and any open transaction); reconnect next batch
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+
+
 class VesselTrackerWebSocket:
-    """Handles WebSocket connection for tracking vessels."""
+    """Handles WebSocket connection for tracking vessels.
+    
+    All trackers run as coroutines on a single asyncio event loop
+    (see run_trackers) instead of one OS thread per connection.
+    """
     
     def __init__(self, batch_id, mmsi_batch, api_key):
         self.batch_id = batch_id
         self.mmsi_batch = mmsi_batch
         self.api_key = api_key
-        self.ws_app = None
-        self.thread = None
         self.running = False
+        self.position_count = 0
         
-    def on_message(self, ws, message):
+        # Batch and key are fixed, so encode the subscription once for all reconnects
+        self.subscribe_payload = json_dumps({
+            "APIKey": api_key,
+            "FiltersShipMMSI": [str(mmsi) for mmsi in mmsi_batch],
+            "BoundingBoxes": [[[90, -180], [-90, 180]]]
+        })
+        
+    def handle_message(self, message):
         """Handle incoming WebSocket messages."""
         try:
-            data = json.loads(message)
+            if (POSITION_MARKER not in message
+                    and ERROR_MARKERS[0] not in message
+                    and ERROR_MARKERS[1] not in message):
+                return
+            
+            data = json_loads(message)
             
             if "error" in data or "Error" in data:
                 print(f"[Batch {self.batch_id}] ERROR: {data}")
@@ -248,101 +494,56 @@ class VesselTrackerWebSocket:
                 lon = metadata.get("longitude")
                 sog = position_data.get("Sog", 0)
                 cog = position_data.get("Cog", 0)
-                timestamp = metadata.get("time_utc", datetime.utcnow().isoformat())
+                timestamp = metadata.get("time_utc")
+                if timestamp is None:
+                    timestamp = datetime.utcnow().isoformat()
                 
                 if mmsi and lat and lon:
-                    # Update vessel position
-                    vessel_positions[mmsi] = {
-                        'lat': lat,
-                        'lon': lon,
-                        'sog': sog,
-                        'cog': cog,
-                        'timestamp': timestamp,
-                        'name': vessel_static_data.get(mmsi, {}).get('name', 'Unknown'),
-                        'length': vessel_static_data.get(mmsi, {}).get('length'),
-                        'flag_state': vessel_static_data.get(mmsi, {}).get('flag_state', 'Unknown')
-                    }
-                    
-                    # Save position to history database
-                    conn = None
-                    try:
-                        project_root = Path(__file__).parent.parent.parent
-                        db_path = project_root / DB_NAME
-                        conn = sqlite3.connect(db_path, timeout=5)
-                        conn.execute('PRAGMA journal_mode=WAL')
-                        cursor = conn.cursor()
-                        cursor.execute('''
-                            INSERT INTO vessel_positions (mmsi, latitude, longitude, sog, cog, timestamp)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (mmsi, lat, lon, sog, cog, timestamp))
-                        conn.commit()
-                    except Exception as e:
-                        print(f"[Position DB] Error saving: {e}")
-                    finally:
-                        if conn:
-                            conn.close()
+                    # Hand off to the single writer thread (apply_position_updates)
+                    position_updates.put((mmsi, lat, lon, sog, cog, timestamp))
                     
-                    # Emit to all connected web clients
-                    socketio.emit('vessel_update', {
-                        'mmsi': mmsi,
-                        'position': vessel_positions[mmsi]
-                    })
-                    
-                    print(f"[Position] {mmsi} - {vessel_positions[mmsi]['name']}: {lat:.4f}, {lon:.4f}")
+                    self.position_count += 1
+                    if self.position_count % POSITION_LOG_INTERVAL == 0:
+                        logger.info("[Batch %s] %d position reports received",
+                                    self.batch_id, self.position_count)
                 
-        except Exception as e:
-            print(f"[Batch {self.batch_id}] Error: {e}")
-    
-    def on_error(self, ws, error):
-        """Handle WebSocket errors."""
-        error_str = str(error)
-        if "Connection to remote host was lost" not in error_str:
-            print(f"[Batch {self.batch_id}] Error: {error}")
+        except Exception:
+            logger.exception("[Batch %s] Error handling message", self.batch_id)
     
-    def on_close(self, ws, close_status_code, close_msg):
-        """Handle WebSocket close."""
-        print(f"[Batch {self.batch_id}] Connection closed")
-    
-    def on_open(self, ws):
-        """Handle WebSocket open and send subscription."""
+    async def subscribe(self, ws):
+        """Send the subscription once the WebSocket is open."""
         print(f"[Batch {self.batch_id}] Connected - Tracking {len(self.mmsi_batch)} vessels")
-        
-        mmsi_strings = [str(mmsi) for mmsi in self.mmsi_batch]
-        
-        subscribe_message = {
-            "APIKey": self.api_key,
-            "FiltersShipMMSI": mmsi_strings,
-            "BoundingBoxes": [[[90, -180], [-90, 180]]]
-        }
-        
-        ws.send(json.dumps(subscribe_message))
+        await ws.send(self.subscribe_payload)
         print(f"[Batch {self.batch_id}] Subscription sent")
     
-    def start(self):
-        """Start the WebSocket connection."""
-        self.running = True
-        self.thread = threading.Thread(target=self._run_forever, daemon=True)
-        self.thread.start()
-    
-    def _run_forever(self):
+    async def run(self):
         """Run WebSocket with auto-reconnect."""
+        self.running = True
+        
         while self.running:
             try:
-                self.ws_app = websocket.WebSocketApp(
-                    WEBSOCKET_URL,
-                    on_open=self.on_open,
-                    on_message=self.on_message,
-                    on_error=self.on_error,
-                    on_close=self.on_close
-                )
-                self.ws_app.run_forever()
-                
-                if self.running:
-                    time.sleep(5)
-                    
+                # AIS frames are small; inflating each with permessage-deflate
+                # costs more CPU than it saves in bandwidth
+                async with connect(WEBSOCKET_URL, compression=None) as ws:
+                    await self.subscribe(ws)
+                    while True:
+                        # Keep text frames as UTF-8 bytes; orjson parses them directly
+                        message = await ws.recv(decode=False)
+                        self.handle_message(message)
+                        
+            except ConnectionClosed:
+                print(f"[Batch {self.batch_id}] Connection closed")
             except Exception as e:
                 print(f"[Batch {self.batch_id}] Exception: {e}")
-                time.sleep(5)
+            
+            if self.running:
+                await asyncio.sleep(5)
+
+
+async def run_trackers(trackers):
+    """Run all tracker connections concurrently on one event loop."""
+    # Connections are established in parallel; no serial start-up delay
+    await asyncio.gather(*(tracker.run() for tracker in trackers))
 
 
 # Flask routes
@@ -352,9 +553,9 @@ def index():
     return render_template('map.html')
 
 
-@app.route('/ships/api/vessels')
-def get_vessels():
-    """Get all tracked vessels and their current positions."""
+def build_vessel_list():
+    """Build the tracked vessel list merged with current positions."""
+    positions = snapshot_positions()
     vessels = []
     for mmsi, static in vessel_static_data.items():
         vessel_info = {
@@ -369,12 +570,28 @@ def get_vessels():
         }
         
         # Add position if available
-        if mmsi in vessel_positions:
-            vessel_info.update(vessel_positions[mmsi])
+        position = positions.get(mmsi)
+        if position is not None:
+            vessel_info.update(position)
         
         vessels.append(vessel_info)
     
-    return jsonify(vessels)
+    return vessels
+
+
+@app.route('/ships/api/vessels')
+def get_vessels():
+    """Get all tracked vessels and their current positions."""
+    global vessels_cache, vessels_cache_time, vessels_cache_dirty
+    
+    # Re-encode at most once per VESSELS_CACHE_TTL, and only after a change
+    now = time.monotonic()
+    if vessels_cache is None or (vessels_cache_dirty and now - vessels_cache_time >= VESSELS_CACHE_TTL):
+        vessels_cache_dirty = False
+        vessels_cache = json_dumps(build_vessel_list())
+        vessels_cache_time = now
+    
+    return Response(vessels_cache, mimetype='application/json')
 
 
 @app.route('/ships/api/stats')
@@ -690,14 +907,46 @@ def export_sql_query():
         return jsonify({'error': str(e)}), 500
 
 
+def build_initial_snapshot():
+    """Build the initial_data payload sent to newly connected clients."""
+    return {
+        'vessels': list(vessel_static_data),
+        'positions': snapshot_positions()
+    }
+
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection."""
+    global initial_snapshot, initial_snapshot_dirty
+    
     print('Client connected')
-    emit('initial_data', {
-        'vessels': list(vessel_static_data.keys()),
-        'positions': vessel_positions
-    })
+    # Rebuild only if positions or static data changed since the last connect
+    if initial_snapshot_dirty:
+        initial_snapshot_dirty = False
+        initial_snapshot = json_fragment(build_initial_snapshot())
+    emit('initial_data', initial_snapshot)
+
+
+def broadcast_updates():
+    """Flush coalesced position updates to web clients on a fixed tick."""
+    global pending_updates
+    
+    while True:
+        socketio.sleep(BROADCAST_INTERVAL)
+        
+        # A failed tick is logged and skipped; the loop has to keep running
+        try:
+            # Copy under the lock: the writer mutates VesselPosition objects in place
+            with positions_lock:
+                batch = {mmsi: position.to_dict() for mmsi, position in pending_updates.items()}
+                pending_updates = {}
+            
+            if batch:
+                # Socket.IO encodes a broadcast once (with orjson) for all clients
+                socketio.emit('vessel_batch', batch)
+        except Exception:
+            logger.exception("[Broadcast] Error sending vessel updates")
 
 
 def start_tracking():
@@ -726,18 +975,20 @@ def start_tracking():
         
         print(f"Creating {len(batches)} tracking connections across {len(api_keys)} API key(s)...")
         
-        # Start trackers - rotate API keys (3 connections per key)
+        # Create trackers - rotate API keys (3 connections per key)
+        trackers = []
         for i, batch in enumerate(batches, 1):
             api_key_index = (i - 1) // 3  # Use each API key for 3 connections
             api_key = api_keys[api_key_index % len(api_keys)]
             print(f"Batch {i}: Using API key #{api_key_index + 1}")
-            tracker = VesselTrackerWebSocket(i, batch, api_key)
-            tracker.start()
-            time.sleep(1)
+            trackers.append(VesselTrackerWebSocket(i, batch, api_key))
         
         tracking_active = True
         print(f"Tracking {sum(len(b) for b in batches)} vessels across {len(batches)} connections")
         
+        # Run every connection on this thread's event loop
+        asyncio.run(run_trackers(trackers))
+        
     except Exception as e:
         print(f"Error starting tracking: {e}")
 
@@ -1518,9 +1769,30 @@ def get_vessel_wind_tech(mmsi):
 
 
 if __name__ == '__main__':
+    # Log records are written to stderr by a listener thread, so the tracker
+    # and writer threads never block on stdio. Set AIS_LOG_LEVEL=DEBUG to log
+    # every position report.
+    log_queue = queue.SimpleQueue()
+    logging.basicConfig(level=logging.INFO, format='%(message)s',
+                        handlers=[logging.handlers.QueueHandler(log_queue)])
+    log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    log_listener.start()
+    atexit.register(log_listener.stop)  # Flush queued records on exit
+    
+    log_level = getattr(logging, os.environ.get('AIS_LOG_LEVEL', 'INFO').strip().upper(), None)
+    if not isinstance(log_level, int):
+        logger.warning("Unknown AIS_LOG_LEVEL %r, using INFO", os.environ['AIS_LOG_LEVEL'])
+        log_level = logging.INFO
+    logger.setLevel(log_level)
+    
     # Start tracking in background
-    tracking_thread = threading.Thread(target=start_tracking, daemon=True)
-    tracking_thread.start()
+    socketio.start_background_task(start_tracking)
+    
+    # Single writer for vessel positions and position history
+    socketio.start_background_task(apply_position_updates)
+    
+    # Push coalesced position updates to web clients
+    socketio.start_background_task(broadcast_updates)
     
     # Give tracking a moment to initialize
     time.sleep(2)